@@ -15,10 +15,20 @@ Mini app Tkinter: Controle de Dívida com Juros (1% a.m.)
 - Sem dependências além de Tkinter
 """
 
+import functools
+import json
+import logging
+import math
+import os
+import queue
+import re
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import date, datetime
-from calendar import monthrange
+
+# Logs detalhados no console (ative com DIVIDA_DEBUG=1)
+DEBUG = os.environ.get("DIVIDA_DEBUG") == "1"
 
 # Importar calendário
 try:
@@ -26,17 +36,8 @@ try:
     CALENDARIO_DISPONIVEL = True
 except ImportError:
     CALENDARIO_DISPONIVEL = False
-    print("⚠️  tkcalendar não encontrado. Instalando...")
-    import subprocess
-    import sys
-    try:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "tkcalendar"])
-        from tkcalendar import DateEntry
-        CALENDARIO_DISPONIVEL = True
-        print("✅ tkcalendar instalado com sucesso!")
-    except Exception as e:
-        print(f"❌ Erro ao instalar tkcalendar: {e}")
-        print("   Continuando com entrada manual de data.")
+    print("⚠️  tkcalendar não encontrado. Usando entrada manual de data.")
+    print("   Para o calendário: pip install tkcalendar")
 
 # Importar módulo de persistência
 try:
@@ -47,45 +48,51 @@ except ImportError:
     print("⚠️  Módulo persistence.py não encontrado. Modo offline ativado.")
 
 
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "config.json")
+
+# Valores padrão
+CONFIG_PADRAO = {
+    "divida_inicial": 50000.00,
+    "taxa_juros": 0.01
+}
+
+
+@functools.lru_cache(maxsize=1)
 def carregar_configuracao():
-    """Carrega configurações do arquivo config.json."""
-    import os
-    import json
-    
-    config_path = os.path.join(os.path.dirname(__file__), "config.json")
-    
-    # Valores padrão
-    config_padrao = {
-        "divida_inicial": 50000.00,
-        "taxa_juros": 0.01
-    }
-    
+    """Carrega configurações do arquivo config.json (lido uma única vez por processo)."""
     try:
-        if os.path.exists(config_path):
-            with open(config_path, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                print(f"✅ Configuração carregada de {config_path}")
-                return {
-                    "divida_inicial": float(config.get("divida_inicial", config_padrao["divida_inicial"])),
-                    "taxa_juros": float(config.get("taxa_juros", config_padrao["taxa_juros"]))
-                }
-        else:
-            print(f"⚠️  Arquivo config.json não encontrado. Usando valores padrão.")
-            # Criar arquivo de configuração padrão
-            with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump({
-                    "divida_inicial": config_padrao["divida_inicial"],
-                    "taxa_juros": config_padrao["taxa_juros"],
-                    "comentarios": {
-                        "divida_inicial": "Valor inicial da dívida em reais",
-                        "taxa_juros": "Taxa de juros mensal (0.01 = 1% ao mês)"
-                    }
-                }, f, indent=2, ensure_ascii=False)
-            print(f"✅ Arquivo config.json criado com valores padrão")
-            return config_padrao
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        print(f"✅ Configuração carregada de {CONFIG_PATH}")
+        return {
+            "divida_inicial": float(config.get("divida_inicial", CONFIG_PADRAO["divida_inicial"])),
+            "taxa_juros": float(config.get("taxa_juros", CONFIG_PADRAO["taxa_juros"]))
+        }
+    except FileNotFoundError:
+        print(f"⚠️  Arquivo config.json não encontrado. Usando valores padrão.")
+        return dict(CONFIG_PADRAO)
     except Exception as e:
         print(f"⚠️  Erro ao carregar config.json: {e}. Usando valores padrão.")
-        return config_padrao
+        return dict(CONFIG_PADRAO)
+
+
+def criar_config_padrao():
+    """Cria config.json com os valores padrão, se ainda não existir (chamado ao iniciar o app)."""
+    if os.path.exists(CONFIG_PATH):
+        return
+    try:
+        with open(CONFIG_PATH, 'w', encoding='utf-8') as f:
+            json.dump({
+                "divida_inicial": CONFIG_PADRAO["divida_inicial"],
+                "taxa_juros": CONFIG_PADRAO["taxa_juros"],
+                "comentarios": {
+                    "divida_inicial": "Valor inicial da dívida em reais",
+                    "taxa_juros": "Taxa de juros mensal (0.01 = 1% ao mês)"
+                }
+            }, f, indent=2, ensure_ascii=False)
+        print(f"✅ Arquivo config.json criado com valores padrão")
+    except Exception as e:
+        print(f"⚠️  Não foi possível criar config.json: {e}")
 
 
 # Carregar configuração
@@ -93,12 +100,134 @@ CONFIG = carregar_configuracao()
 DIVIDA_INICIAL = CONFIG["divida_inicial"]
 TAXA_JUROS = CONFIG["taxa_juros"]
 
+# Máscara de data: remove tudo que não é dígito
+_NAO_DIGITO = re.compile(r"\D")
+
+# Valores digitados (após remover "R$" e espaços): remove o separador de milhar '.'
+# e troca a vírgula decimal por ponto (ex.: "2.500,50" -> "2500.50")
+_VALOR_TRANS = str.maketrans({".": None, ",": "."})
+
+# Tabela de histórico: altura de cada linha (px) e linhas exibidas por padrão
+ALTURA_LINHA_TABELA = 25
+LINHAS_VISIVEIS_PADRAO = 16
+
 
 def format_brl(valor: float) -> str:
     """Formata número float no padrão brasileiro simples (R$ 1.234,56) sem depender de locale."""
-    s = f"{valor:,.2f}"  # ex: 12,345.67 (padrão EUA)
-    s = s.replace(",", "X").replace(".", ",").replace("X", ".")
-    return f"R$ {s}"
+    # Aritmética inteira em centavos. round(valor, 2) primeiro: arredonda como o
+    # formato ".2f" (o valor digitado pode ter mais de 2 casas)
+    centavos = round(round(valor, 2) * 100)
+    sinal = "-" if centavos < 0 else ""
+    reais, cent = divmod(abs(centavos), 100)
+    milhar = f"{reais:,}".replace(",", ".")
+    return f"R$ {sinal}{milhar},{cent:02d}"
+
+
+class Registro:
+    """
+    Um pagamento do histórico (um mês).
+    
+    Usa __slots__: sem um dict por instância, cada registro ocupa menos memória e o
+    acesso aos campos é direto. Os campos *_fmt guardam as strings BRL exibidas na
+    tabela (None até formatar_registro ser chamado).
+    """
+    __slots__ = (
+        "mes", "data", "valor", "juros", "amort", "saldo", "status", "server_id",
+        "valor_fmt", "juros_fmt", "amort_fmt", "saldo_fmt",
+    )
+    
+    def __init__(self, mes: int, data: str, valor: float, juros: float, amort: float,
+                 saldo: float, status: str, server_id=None):
+        self.mes = mes
+        self.data = data
+        self.valor = valor
+        self.juros = juros
+        self.amort = amort
+        self.saldo = saldo
+        self.status = status
+        self.server_id = server_id  # ID no JSON Server (None até o create concluir)
+        self.valor_fmt = self.juros_fmt = self.amort_fmt = self.saldo_fmt = None
+    
+    @classmethod
+    def do_servidor(cls, dados: dict, mes_padrao: int) -> "Registro":
+        """Converte um registro do JSON Server para o formato local (descarta 'createdAt')."""
+        return cls(
+            mes=dados.get("mes", mes_padrao),
+            data=dados.get("data", ""),
+            valor=float(dados.get("valor", 0.0)),
+            juros=float(dados.get("juros", 0.0)),
+            amort=float(dados.get("amort", 0.0)),
+            saldo=float(dados.get("saldo", 0.0)),
+            status=dados.get("status", "Pago"),
+            server_id=dados.get("id"),
+        )
+    
+    def para_servidor(self) -> dict:
+        """Campos enviados ao JSON Server (sem server_id e sem os textos formatados)."""
+        return {
+            "mes": self.mes,
+            "data": self.data,
+            "valor": self.valor,
+            "juros": self.juros,
+            "amort": self.amort,
+            "saldo": self.saldo,
+            "status": self.status,
+        }
+
+
+def formatar_registro(reg: Registro) -> None:
+    """Guarda no registro as strings BRL exibidas na tabela (valor_fmt, juros_fmt, amort_fmt, saldo_fmt)."""
+    reg.valor_fmt = format_brl(reg.valor)
+    reg.juros_fmt = format_brl(reg.juros)
+    reg.amort_fmt = format_brl(reg.amort)
+    reg.saldo_fmt = format_brl(reg.saldo)
+
+
+def calcular_parcelas(saldo_inicial: float, taxa: float, valores) -> tuple:
+    """
+    Aplica a sequência de pagamentos `valores` a partir de `saldo_inicial`.
+    
+    Para cada mês: juros = saldo * taxa; amortização = valor - juros;
+    novo saldo = saldo - amortização (tudo arredondado a centavos). Se o pagamento
+    exceder saldo + juros, o valor efetivo é reduzido para quitar a dívida.
+    
+    A recorrência depende do saldo anterior e usa o arredondamento de `round`,
+    então é mantida em Python puro (sem NumPy/Numba) para não alterar valores.
+    Pelo mesmo motivo não há forma fechada com potências de (1 + taxa): o saldo
+    arredondado de cada mês é a base do mês seguinte.
+    
+    Returns:
+        Colunas (valores_efetivos, juros, amorts, saldos), cada uma com um item por pagamento
+    """
+    col_valor, col_juros, col_amort, col_saldo = [], [], [], []
+    saldo = saldo_inicial
+    for valor in valores:
+        # Arredonda a cada passo (não uma vez no fim): os centavos de cada mês entram no seguinte
+        juros = round(saldo * taxa, 2)
+        amort = round(valor - juros, 2)
+        novo_saldo = round(saldo - amort, 2)
+        if novo_saldo < 0:
+            # Ajusta amortização e valor pago efetivo para zerar saldo
+            amort = round(amort + novo_saldo, 2)  # novo_saldo é negativo
+            valor = round(valor + novo_saldo, 2)
+            novo_saldo = 0.0
+        col_valor.append(valor)
+        col_juros.append(juros)
+        col_amort.append(amort)
+        col_saldo.append(novo_saldo)
+        saldo = novo_saldo
+    return col_valor, col_juros, col_amort, col_saldo
+
+
+# Dias de cada mês em ano não bissexto
+_DIAS_NO_MES = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def _ultimo_dia(year: int, month: int) -> int:
+    """Último dia do mês (equivalente a calendar.monthrange(year, month)[1])."""
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        return 29
+    return _DIAS_NO_MES[month - 1]
 
 
 def next_month(d: date) -> date:
@@ -106,10 +235,37 @@ def next_month(d: date) -> date:
     year = d.year + (1 if d.month == 12 else 0)
     month = 1 if d.month == 12 else d.month + 1
     day = d.day
-    last_day = monthrange(year, month)[1]
+    last_day = _ultimo_dia(year, month)
     return date(year, month, min(day, last_day))
 
 
+def _configurar_estilos(master: tk.Misc) -> None:
+    """Define tema e estilos ttk da janela raiz (chamada uma vez, no __init__)."""
+    style = ttk.Style(master)
+    try:
+        if "vista" in style.theme_names():
+            style.theme_use("vista")
+        else:
+            style.theme_use("clam")
+    except Exception:
+        pass
+
+    # Configurar estilo da tabela com linhas visíveis
+    style.configure("Treeview", 
+                   rowheight=ALTURA_LINHA_TABELA,
+                   borderwidth=1,
+                   relief="solid",
+                   background="#FFFFFF",
+                   fieldbackground="#FFFFFF")
+    style.configure("Treeview.Heading",
+                   font=("Segoe UI", 9, "bold"),
+                   background="#E0E0E0",
+                   borderwidth=1,
+                   relief="raised")
+    style.map("Treeview.Heading",
+             background=[("active", "#D0D0D0")])
+
+
 class ControleDividaApp(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -121,13 +277,13 @@ class ControleDividaApp(tk.Tk):
         # Estado em memória
         self.divida_inicial = DIVIDA_INICIAL
         self.taxa = TAXA_JUROS
-        self.registros = []  # lista de dicts com as colunas
+        self.registros = []  # lista de Registro (um por mês, na ordem da tabela)
         self.total_pago = 0.0
         self.saldo_restante = self.divida_inicial
         
-        # Controle de persistência
+        # Controle de persistência (verificado em segundo plano após montar a UI)
         self.modo_online = False
-        self._verificar_servidor()
+        self.verificando_servidor = PERSISTENCIA_DISPONIVEL
 
         # Próxima data sugerida (começa hoje; a cada registro, sugere mês seguinte)
         self.data_sugerida = date.today()
@@ -137,18 +293,30 @@ class ControleDividaApp(tk.Tk):
         self.var_data = tk.StringVar(value=self.data_sugerida.strftime("%d/%m/%Y"))
         self.var_status = tk.StringVar(value="Pago")
 
-        print("🎨 Resumos iniciais:")
-        print(f"   Total pago: {format_brl(self.total_pago)}")
-        print(f"   Dívida restante: {format_brl(self.saldo_restante)}")
+        if DEBUG:
+            print("🎨 Resumos iniciais:")
+            print(f"   Total pago: {format_brl(self.total_pago)}")
+            print(f"   Dívida restante: {format_brl(self.saldo_restante)}")
 
         # Layout principal
+        _configurar_estilos(self)
         self._build_header()
         self._build_form()
         self._build_table()
         self._build_footer()
         
-        # Carregar dados do servidor (se disponível)
-        self._carregar_registros_iniciais()
+        # Respostas de threads de fundo, aplicadas na thread do Tk
+        self._respostas = queue.Queue()
+        self._processar_respostas()
+
+        # Escritas no servidor: uma única thread consome a fila em ordem (FIFO)
+        self._fila_escrita = queue.Queue()
+        self._thread_escrita = threading.Thread(target=self._processar_escritas, daemon=True)
+        self._thread_escrita.start()
+        self.protocol("WM_DELETE_WINDOW", self._ao_fechar)
+
+        # Verificar servidor e carregar dados sem bloquear a janela
+        self._iniciar_verificacao_servidor()
 
         self.entry_valor.focus_set()
 
@@ -157,19 +325,27 @@ class ControleDividaApp(tk.Tk):
         header = ttk.Frame(self, padding=(12, 12, 12, 8))
         header.pack(fill="x")
 
-        taxa_percentual = self.taxa * 100
-        ttk.Label(header, text=f"Controle de Dívida com Juros ({taxa_percentual:.1f}% a.m.)", font=("Segoe UI", 14, "bold")).pack(anchor="w")
+        self.label_titulo = ttk.Label(header, font=("Segoe UI", 14, "bold"))
+        self.label_titulo.pack(anchor="w")
         
-        # Indicador de modo (online/offline)
-        modo_texto = "🟢 Online" if self.modo_online else "🔴 Offline"
-        sub_texto = f"Dívida inicial: {format_brl(self.divida_inicial)}   •   Juros: {taxa_percentual:.1f}% ao mês   •   {modo_texto}"
-        
-        sub = ttk.Label(
+        self.label_sub = ttk.Label(
             header,
-            text=sub_texto,
             font=("Segoe UI", 10),
         )
-        sub.pack(anchor="w", pady=(2, 0))
+        self.label_sub.pack(anchor="w", pady=(2, 0))
+        self._atualiza_header()
+
+    def _atualiza_header(self):
+        taxa_percentual = self.taxa * 100
+        self.label_titulo.config(text=f"Controle de Dívida com Juros ({taxa_percentual:.1f}% a.m.)")
+        
+        # Indicador de modo (online/offline)
+        if self.verificando_servidor:
+            modo_texto = "⏳ Verificando servidor..."
+        else:
+            modo_texto = "🟢 Online" if self.modo_online else "🔴 Offline"
+        sub_texto = f"Dívida inicial: {format_brl(self.divida_inicial)}   •   Juros: {taxa_percentual:.1f}% ao mês   •   {modo_texto}"
+        self.label_sub.config(text=sub_texto)
 
     def _build_form(self):
         form = ttk.Frame(self, padding=(12, 6, 12, 6))
@@ -243,26 +419,8 @@ class ControleDividaApp(tk.Tk):
 
         ttk.Label(bloco, text="Histórico de Pagamentos", font=("Segoe UI", 10, "bold")).pack(anchor="w", pady=(0, 6))
 
-        # Configurar estilo da tabela com linhas visíveis
-        style = ttk.Style()
-        style.configure("Treeview", 
-                       rowheight=25,
-                       borderwidth=1,
-                       relief="solid")
-        style.configure("Treeview.Heading",
-                       font=("Segoe UI", 9, "bold"),
-                       background="#E0E0E0",
-                       borderwidth=1,
-                       relief="raised")
-        style.map("Treeview.Heading",
-                 background=[("active", "#D0D0D0")])
-        
-        # Cores alternadas para as linhas
-        self.tabela_tag_config = True
-        style.configure("Treeview", background="#FFFFFF", fieldbackground="#FFFFFF")
-
         cols = ("mes", "data", "valor", "juros", "amort", "saldo", "status")
-        self.tabela = ttk.Treeview(bloco, columns=cols, show="headings", height=16)
+        self.tabela = ttk.Treeview(bloco, columns=cols, show="headings", height=LINHAS_VISIVEIS_PADRAO, selectmode="browse")
         self.tabela.heading("mes", text="Mês")
         self.tabela.heading("data", text="Data")
         self.tabela.heading("valor", text="Valor Pago")
@@ -285,10 +443,31 @@ class ControleDividaApp(tk.Tk):
 
         self.tabela.pack(fill="both", expand=True)
 
+        # Visualização virtualizada: a Treeview contém apenas as linhas visíveis
+        # de self.registros; a scrollbar e a roda do mouse deslocam essa janela.
+        self._inicio_visivel = 0
+        self._linhas_visiveis = LINHAS_VISIVEIS_PADRAO
+        self._indice_selecionado = None  # posição em self.registros (sobrevive à rolagem)
+        self._itens_visiveis = []  # iids na ordem da janela visível
+        self._iid_para_registro = {}  # iid da Treeview -> registro exibido nela
+
         # Scrollbar vertical
-        scroll_y = ttk.Scrollbar(bloco, orient="vertical", command=self.tabela.yview)
-        self.tabela.configure(yscrollcommand=scroll_y.set)
-        scroll_y.pack(side="right", fill="y")
+        self.scroll_y = ttk.Scrollbar(bloco, orient="vertical", command=self._on_scroll)
+        self.scroll_y.pack(side="right", fill="y")
+
+        self.tabela.bind("<MouseWheel>", self._on_mousewheel)
+        self.tabela.bind("<Button-4>", self._on_mousewheel)
+        self.tabela.bind("<Button-5>", self._on_mousewheel)
+        self.tabela.bind("<Configure>", self._on_resize_tabela)
+        self.tabela.bind("<<TreeviewSelect>>", self._on_select_tabela)
+
+        # Navegação por teclado além da janela visível
+        self.tabela.bind("<Up>", lambda e: self._mover_selecao(-1))
+        self.tabela.bind("<Down>", lambda e: self._mover_selecao(1))
+        self.tabela.bind("<Prior>", lambda e: self._mover_selecao(-self._linhas_visiveis))
+        self.tabela.bind("<Next>", lambda e: self._mover_selecao(self._linhas_visiveis))
+        self.tabela.bind("<Home>", lambda e: self._mover_selecao(-len(self.registros)))
+        self.tabela.bind("<End>", lambda e: self._mover_selecao(len(self.registros)))
 
     def _build_footer(self):
         rodape = ttk.Frame(self, padding=(12, 8, 12, 12))
@@ -306,36 +485,128 @@ class ControleDividaApp(tk.Tk):
         self.btn_reset.pack(side="right", padx=(0, 8))
 
     # ---------- Persistência ----------
-    def _verificar_servidor(self):
-        """Verifica se o JSON Server está acessível."""
+    def _processar_respostas(self):
+        """Executa na thread do Tk os callbacks enfileirados pelas threads de fundo."""
+        while True:
+            try:
+                callback, args = self._respostas.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                # Um callback com erro não pode parar a fila: os seguintes seriam perdidos
+                print(f"❌ Erro ao processar resposta do servidor ({getattr(callback, '__name__', callback)}): {e}")
+                if DEBUG:
+                    import traceback
+                    traceback.print_exc()
+        self.after(50, self._processar_respostas)
+
+    def _processar_escritas(self):
+        """Loop da thread de escrita: executa as tarefas enfileiradas por _enfileirar_escrita."""
+        while True:
+            tarefa = self._fila_escrita.get()
+            if tarefa is None:
+                break
+            funcao, args, aviso = tarefa
+            try:
+                funcao(*args)
+            except Exception as e:
+                print(f"⚠️  {aviso.splitlines()[0]} {e}")
+                self._respostas.put((messagebox.showwarning, ("Aviso", aviso.format(erro=e))))
+
+    def _enfileirar_escrita(self, funcao, *args, aviso):
+        """
+        Agenda `funcao(*args)` na thread de escrita; a UI não espera a resposta do servidor.
+        
+        `aviso` é exibido (com `{erro}` substituído) se a chamada falhar.
+        """
+        self._fila_escrita.put((funcao, args, aviso))
+
+    def _ao_fechar(self):
+        """Aguarda brevemente as escritas pendentes antes de fechar a janela."""
+        self._fila_escrita.put(None)
+        self._thread_escrita.join(timeout=5)
+        self.destroy()
+
+    # Tarefas executadas na thread de escrita. Como a fila é FIFO, um update/delete
+    # sempre roda depois do create do mesmo registro e já encontra o server_id.
+    def _salvar_registro_servidor(self, registro, registro_servidor):
+        resultado = persistence.create_registro(registro_servidor)
+        registro.server_id = resultado.get("id")  # Guardar ID do servidor
+        if DEBUG:
+            print(f"✅ Registro salvo no servidor com ID: {resultado.get('id')}")
+
+    def _atualizar_status_servidor(self, registro, status):
+        if registro.server_id is not None:
+            persistence.update_registro(registro.server_id, {"status": status})
+
+    def _remover_registro_servidor(self, registro):
+        if registro.server_id is not None:
+            persistence.delete_registro(registro.server_id)
+
+    def _remover_registros_servidor(self, registros):
+        persistence.bulk_delete([r.server_id for r in registros if r.server_id is not None])
+
+    def _iniciar_verificacao_servidor(self):
+        """Dispara a verificação do servidor em uma thread de fundo."""
         if not PERSISTENCIA_DISPONIVEL:
-            self.modo_online = False
             return
         
-        if persistence.verificar_conexao():
-            self.modo_online = True
-            print("✅ Conectado ao JSON Server")
-            
+        # Evita registrar pagamentos antes de saber se há histórico no servidor
+        self.btn_registrar.state(["disabled"])
+        threading.Thread(target=self._verificar_servidor, daemon=True).start()
+
+    def _verificar_servidor(self):
+        """Verifica se o JSON Server está acessível e busca config e registros (thread de fundo)."""
+        online = persistence.verificar_conexao()
+        config = None
+        registros_servidor = []
+        erro = None
+        
+        if online:
             # Tentar carregar configuração do servidor
             try:
-                config = persistence.read_config()
-                if config:
-                    self.divida_inicial = float(config.get("divida_inicial", DIVIDA_INICIAL))
-                    self.taxa = float(config.get("taxa", TAXA_JUROS))
-                    self.saldo_restante = self.divida_inicial
+                dados = persistence.read_config()
+                # Conversão aqui: um valor inválido no /config cai no aviso abaixo
+                config = {
+                    "divida_inicial": float(dados.get("divida_inicial", DIVIDA_INICIAL)),
+                    "taxa": float(dados.get("taxa", TAXA_JUROS)),
+                }
             except Exception as e:
                 print(f"⚠️  Erro ao carregar config: {e}")
+            
+            try:
+                registros_servidor = persistence.read_all_registros()
+            except Exception as e:
+                erro = e
+        
+        self._respostas.put((self._aplicar_estado_servidor, (online, config, registros_servidor, erro)))
+
+    def _aplicar_estado_servidor(self, online, config, registros_servidor, erro):
+        """Aplica na UI o resultado de _verificar_servidor."""
+        self.verificando_servidor = False
+        self.modo_online = online
+        
+        if online:
+            if DEBUG:
+                print("✅ Conectado ao JSON Server")
+            if config:
+                self.divida_inicial = config["divida_inicial"]
+                self.taxa = config["taxa"]
+                self.saldo_restante = self.divida_inicial
+            self._carregar_registros_iniciais(registros_servidor, erro)
         else:
-            self.modo_online = False
             print("⚠️  JSON Server não acessível. Modo offline ativado.")
-    
-    def _carregar_registros_iniciais(self):
-        """Carrega registros existentes do servidor ao iniciar."""
-        if not self.modo_online:
-            return
         
+        self._atualiza_header()
+        self.btn_registrar.state(["!disabled"])
+    
+    def _carregar_registros_iniciais(self, registros_servidor, erro=None):
+        """Carrega no estado local os registros buscados do servidor ao iniciar."""
         try:
-            registros_servidor = persistence.read_all_registros()
+            if erro is not None:
+                raise erro
             
             if not registros_servidor:
                 return
@@ -343,29 +614,16 @@ class ControleDividaApp(tk.Tk):
             # Ordenar por id para garantir ordem cronológica
             registros_servidor.sort(key=lambda r: r.get("id", 0))
             
-            # Processar cada registro
+            # Processar cada registro (a tabela é renderizada uma única vez no recálculo abaixo)
             for reg_servidor in registros_servidor:
-                # Converter para formato local (sem 'id' e 'createdAt')
-                reg_local = {
-                    "mes": reg_servidor.get("mes", len(self.registros) + 1),
-                    "data": reg_servidor.get("data", ""),
-                    "valor": float(reg_servidor.get("valor", 0.0)),
-                    "juros": float(reg_servidor.get("juros", 0.0)),
-                    "amort": float(reg_servidor.get("amort", 0.0)),
-                    "saldo": float(reg_servidor.get("saldo", 0.0)),
-                    "status": reg_servidor.get("status", "Pago"),
-                    "server_id": reg_servidor.get("id")  # Guardar ID do servidor
-                }
-                
-                self.registros.append(reg_local)
-                self._adiciona_na_tabela(reg_local)
+                self.registros.append(Registro.do_servidor(reg_servidor, len(self.registros) + 1))
             
             # Recalcular agregados
             if self.registros:
                 self._recalcular_agregado_e_table()
                 
                 # Atualizar data sugerida para o próximo mês
-                ultima_data_str = self.registros[-1]["data"]
+                ultima_data_str = self.registros[-1].data
                 try:
                     d, m, a = ultima_data_str.split("/")
                     ultima_data = date(int(a), int(m), int(d))
@@ -378,7 +636,8 @@ class ControleDividaApp(tk.Tk):
                 except Exception:
                     pass
             
-            print(f"✅ Carregados {len(self.registros)} registros do servidor")
+            if DEBUG:
+                print(f"✅ Carregados {len(self.registros)} registros do servidor")
             
         except Exception as e:
             print(f"⚠️  Erro ao carregar registros: {e}")
@@ -398,21 +657,24 @@ class ControleDividaApp(tk.Tk):
         
         texto = self.var_data.get()
         
-        # Remove tudo que não é dígito
-        apenas_numeros = ''.join(c for c in texto if c.isdigit())
+        # Remove tudo que não é dígito e limita a 8 dígitos (ddmmaaaa)
+        digitos = _NAO_DIGITO.sub("", texto)[:8]
         
-        if not apenas_numeros:
+        if not digitos:
             return
         
-        # Limita a 8 dígitos (ddmmaaaa)
-        apenas_numeros = apenas_numeros[:8]
-        
         # Aplica a máscara
-        formatado = apenas_numeros
-        if len(apenas_numeros) > 2:
-            formatado = apenas_numeros[:2] + '/' + apenas_numeros[2:]
-        if len(apenas_numeros) > 4:
-            formatado = apenas_numeros[:2] + '/' + apenas_numeros[2:4] + '/' + apenas_numeros[4:]
+        n = len(digitos)
+        if n > 4:
+            formatado = f"{digitos[:2]}/{digitos[2:4]}/{digitos[4:]}"
+        elif n > 2:
+            formatado = f"{digitos[:2]}/{digitos[2:]}"
+        else:
+            formatado = digitos
+        
+        # Texto já mascarado (ex.: tecla que não altera o campo): nada a fazer
+        if formatado == texto:
+            return
         
         # Atualiza o campo
         self.var_data.set(formatado)
@@ -429,25 +691,19 @@ class ControleDividaApp(tk.Tk):
         - R$ 2.500,50 (formatado)
         - 2.500,50 (com separador de milhar)
         """
-        texto = texto.strip()
-        
-        if not texto:
-            raise ValueError("Informe um valor.")
-        
-        # Remove R$, espaços
+        # Remove o prefixo "R$" (inteiro, não letra a letra) e espaços
         t = texto.replace("R$", "").replace(" ", "").strip()
         
         # Se ficou vazio, erro
         if not t:
             raise ValueError("Informe um valor.")
         
-        # Remove separador de milhar '.' e troca ',' por '.' para decimal
-        # Exemplo: "2.500,50" -> "2500.50"
-        t = t.replace(".", "").replace(",", ".")
+        # Separador de milhar e vírgula decimal em uma única passada (ver _VALOR_TRANS)
+        t = t.translate(_VALOR_TRANS)
         
         try:
             valor = float(t)
-            if valor <= 0:
+            if not math.isfinite(valor) or valor <= 0:
                 raise ValueError("O valor deve ser maior que zero.")
             return valor
         except ValueError:
@@ -468,134 +724,91 @@ class ControleDividaApp(tk.Tk):
             raise ValueError("Data inválida. Use dd/mm/aaaa.")
 
     def registrar_pagamento(self):
-        print("\n" + "🎯 INICIANDO REGISTRO DE PAGAMENTO " + "="*30)
-        
         # Pegar valor diretamente do widget Entry
         valor_digitado = self.entry_valor.get()
-        print(f"📝 Valor do Entry widget: '{valor_digitado}'")
-        print(f"📝 Valor da StringVar: '{self.var_valor.get()}'")
         
         # Validar e parse do valor
         try:
             valor_pago = self._parse_valor(valor_digitado)
-            print(f"✅ Valor parseado: {valor_pago}")
         except ValueError as e:
-            print(f"❌ Erro no parse do valor: {e}")
+            if DEBUG:
+                print(f"❌ Erro no parse do valor '{valor_digitado}': {e}")
             messagebox.showerror("Erro", str(e))
             self.entry_valor.focus_set()
             return
 
         # Obter data do calendário ou entrada manual
-        print(f"📅 Calendário disponível: {CALENDARIO_DISPONIVEL}")
         try:
             if CALENDARIO_DISPONIVEL:
                 data_pag = self.date_picker.get_date()
-                print(f"📅 Data do calendário: {data_pag}")
             else:
-                campo_data = self.var_data.get()
-                print(f"📅 Campo data: '{campo_data}'")
-                data_pag = self._parse_data(campo_data)
-                print(f"📅 Data parseada: {data_pag}")
+                data_pag = self._parse_data(self.var_data.get())
         except ValueError as e:
-            print(f"❌ Erro no parse da data: {e}")
+            if DEBUG:
+                print(f"❌ Erro no parse da data: {e}")
             messagebox.showerror("Erro", str(e))
             return
 
         status = self.var_status.get() or "Pago"
-        print(f"📌 Status: {status}")
 
         if self.saldo_restante <= 0:
             messagebox.showinfo("Concluído", "A dívida já foi quitada!")
             return
 
-        # Cálculo do mês
+        # Cálculo do mês (ajusta o valor se o pagamento quitar a dívida)
         saldo_anterior = self.saldo_restante
-        juros = round(saldo_anterior * self.taxa, 2)
-        amortizacao = round(valor_pago - juros, 2)
-        novo_saldo = round(saldo_anterior - amortizacao, 2)
-
-        # Se pagamento exceder o saldo devedor + juros, ajusta para quitar
-        if novo_saldo < 0:
-            # Ajusta amortização e valor pago efetivo para zerar saldo
-            amortizacao += novo_saldo  # novo_saldo é negativo
-            valor_pago += novo_saldo
-            novo_saldo = 0.0
-            amortizacao = round(amortizacao, 2)
-            valor_pago = round(valor_pago, 2)
+        (valor_pago,), (juros,), (amortizacao,), (novo_saldo,) = calcular_parcelas(saldo_anterior, self.taxa, [valor_pago])
 
         # Atualiza estado agregado
         self.total_pago = round(self.total_pago + max(0.0, valor_pago), 2)
         self.saldo_restante = novo_saldo
-        
-        print(f"💰 Total pago atualizado: {format_brl(self.total_pago)}")
-        print(f"💳 Dívida restante atualizada: {format_brl(self.saldo_restante)}")
 
         # Guarda registro
-        registro = {
-            "mes": len(self.registros) + 1,
-            "data": data_pag.strftime("%d/%m/%Y"),
-            "valor": valor_pago,
-            "juros": juros,
-            "amort": amortizacao,
-            "saldo": novo_saldo,
-            "status": status,
-        }
+        registro = Registro(
+            mes=len(self.registros) + 1,
+            data=data_pag.strftime("%d/%m/%Y"),
+            valor=valor_pago,
+            juros=juros,
+            amort=amortizacao,
+            saldo=novo_saldo,
+            status=status,
+        )
+        formatar_registro(registro)
         
         # Debug: mostrar dados calculados
-        print("\n" + "="*60)
-        print("🔍 DEBUG - DADOS DO REGISTRO")
-        print("="*60)
-        print(f"Valor digitado: {valor_digitado}")
-        print(f"Valor parseado: {valor_pago}")
-        print(f"Data selecionada: {data_pag}")
-        print(f"Status: {status}")
-        print(f"Modo online: {self.modo_online}")
-        print(f"Saldo anterior: R$ {saldo_anterior:,.2f}")
-        print(f"Juros (1%): R$ {juros:,.2f}")
-        print(f"Amortização: R$ {amortizacao:,.2f}")
-        print(f"Novo saldo: R$ {novo_saldo:,.2f}")
-        print("="*60)
-        
-        # Tentar salvar no servidor
+        if DEBUG:
+            print("\n" + "="*60)
+            print("🔍 DEBUG - DADOS DO REGISTRO")
+            print("="*60)
+            print(f"Valor digitado: {valor_digitado}")
+            print(f"Valor parseado: {valor_pago}")
+            print(f"Data selecionada: {data_pag}")
+            print(f"Status: {status}")
+            print(f"Modo online: {self.modo_online}")
+            print(f"Saldo anterior: R$ {saldo_anterior:,.2f}")
+            print(f"Juros: R$ {juros:,.2f}")
+            print(f"Amortização: R$ {amortizacao:,.2f}")
+            print(f"Novo saldo: R$ {novo_saldo:,.2f}")
+            print(f"Total pago: {format_brl(self.total_pago)}")
+            print("="*60)
+        
+        # Salvar no servidor em segundo plano
         if self.modo_online:
-            print("📡 Tentando salvar no servidor...")
-            try:
-                registro_servidor = {
-                    "mes": registro["mes"],
-                    "data": registro["data"],
-                    "valor": registro["valor"],
-                    "juros": registro["juros"],
-                    "amort": registro["amort"],
-                    "saldo": registro["saldo"],
-                    "status": registro["status"],
-                    "createdAt": datetime.now().isoformat() + "Z"
-                }
-                
-                print("📤 Dados que serão enviados:")
-                import json
-                print(json.dumps(registro_servidor, indent=2, ensure_ascii=False))
-                
-                resultado = persistence.create_registro(registro_servidor)
-                registro["server_id"] = resultado.get("id")  # Guardar ID do servidor
-                
-                print(f"✅ Registro salvo no servidor com ID: {resultado.get('id')}")
-                
-            except Exception as e:
-                print(f"❌ ERRO ao salvar no servidor: {type(e).__name__}: {e}")
-                import traceback
-                traceback.print_exc()
-                messagebox.showwarning(
-                    "Aviso",
-                    f"Erro ao salvar no servidor:\n{e}\n\nRegistro salvo apenas localmente."
-                )
-        else:
+            registro_servidor = registro.para_servidor()
+            registro_servidor["createdAt"] = datetime.now().isoformat() + "Z"
+            self._enfileirar_escrita(
+                self._salvar_registro_servidor, registro, registro_servidor,
+                aviso="Erro ao salvar no servidor:\n{erro}\n\nRegistro salvo apenas localmente."
+            )
+        elif DEBUG:
             print("⚠️  Modo offline - registro NÃO será salvo no servidor")
         
         self.registros.append(registro)
 
-        # Atualiza UI
+        # Atualiza UI (rola a tabela até o registro recém-adicionado)
         self._atualiza_resumos()
-        self._adiciona_na_tabela(registro)
+        self._inicio_visivel = len(self.registros)
+        self._renderizar_tabela()
 
         # Preparar próximos campos
         self.data_sugerida = next_month(data_pag)
@@ -613,35 +826,150 @@ class ControleDividaApp(tk.Tk):
         if self.saldo_restante == 0.0:
             messagebox.showinfo("Parabéns", "Dívida quitada! 🎉")
 
-    def _adiciona_na_tabela(self, reg: dict):
-        # Determinar tag para cor alternada
-        row_count = len(self.tabela.get_children())
-        tag = "evenrow" if row_count % 2 == 0 else "oddrow"
-        
-        self.tabela.insert(
-            "",
-            "end",
-            values=(
-                reg["mes"],
-                reg["data"],
-                format_brl(reg["valor"]),
-                format_brl(reg["juros"]),
-                format_brl(reg["amort"]),
-                format_brl(reg["saldo"]),
-                reg["status"],
-            ),
-            tags=(tag,)
+    # ---------- Tabela virtualizada ----------
+    def _renderizar_tabela(self):
+        """Insere na Treeview apenas a janela visível de self.registros e atualiza a scrollbar."""
+        total = len(self.registros)
+        inicio = max(0, min(self._inicio_visivel, total - self._linhas_visiveis))
+        fim = min(total, inicio + self._linhas_visiveis)
+        self._inicio_visivel = inicio
+
+        # Reaproveita as linhas já existentes (só troca valores/tags); cria ou remove
+        # apenas a diferença quando o tamanho da janela muda
+        visiveis = self.registros[inicio:fim]
+        itens = self._itens_visiveis[:len(visiveis)]
+        excedentes = self._itens_visiveis[len(visiveis):]
+        if excedentes:
+            self.tabela.delete(*excedentes)
+
+        # Chamadas Tcl diretas: evitam o processamento de kwargs de Treeview.item/insert por linha
+        tk_call = self.tabela.tk.call
+        widget = self.tabela._w
+        for item_id, reg in zip(itens, visiveis):
+            tk_call(widget, "item", item_id, "-values", self._valores_linha(reg), "-tags", self._tag_linha(reg))
+        for reg in visiveis[len(itens):]:
+            itens.append(
+                tk_call(widget, "insert", "", "end", "-values", self._valores_linha(reg), "-tags", self._tag_linha(reg))
+            )
+        self._itens_visiveis = itens
+        self._iid_para_registro = dict(zip(itens, visiveis))
+
+        # Restaura a seleção se a linha selecionada continua visível; senão limpa,
+        # já que a linha reaproveitada agora mostra outro registro
+        sel = self._indice_selecionado
+        if sel is not None and inicio <= sel < fim:
+            item_id = itens[sel - inicio]
+            self.tabela.selection_set(item_id)
+            self.tabela.focus(item_id)
+        else:
+            selecionados = self.tabela.selection()
+            if selecionados:
+                self.tabela.selection_remove(*selecionados)
+
+        if total:
+            self.scroll_y.set(inicio / total, fim / total)
+        else:
+            self.scroll_y.set(0.0, 1.0)
+        # A Treeview pode ter rolado sozinha (ex.: `see` ao clicar numa linha cortada);
+        # a janela virtual exibe sempre a partir da primeira linha
+        self.tabela.yview_moveto(0)
+
+    def _rolar_tabela(self, inicio: int):
+        """Desloca a janela visível para começar em `inicio` (re-renderiza só se mudou)."""
+        inicio = max(0, min(inicio, len(self.registros) - self._linhas_visiveis))
+        if inicio != self._inicio_visivel:
+            self._inicio_visivel = inicio
+            self._renderizar_tabela()
+
+    def _on_scroll(self, *args):
+        """Callback da scrollbar: ('moveto', fração) ou ('scroll', n, 'units'|'pages')."""
+        if args[0] == "moveto":
+            self._rolar_tabela(int(float(args[1]) * len(self.registros)))
+        elif args[0] == "scroll":
+            passo = int(args[1])
+            if args[2] == "pages":
+                passo *= self._linhas_visiveis
+            self._rolar_tabela(self._inicio_visivel + passo)
+
+    def _on_mousewheel(self, event):
+        if event.num == 4:
+            passo = -3
+        elif event.num == 5:
+            passo = 3
+        else:
+            passo = -3 if event.delta > 0 else 3
+        self._rolar_tabela(self._inicio_visivel + passo)
+        return "break"
+
+    def _on_select_tabela(self, event):
+        sel = self.tabela.selection()
+        # Seleção vazia vem da re-renderização (itens apagados), não do usuário
+        if sel:
+            # "mes" é a posição 1-based do registro em self.registros
+            self._indice_selecionado = self._iid_para_registro[sel[0]].mes - 1
+
+    def _mover_selecao(self, delta: int):
+        """Move a seleção `delta` linhas em self.registros, rolando a janela se preciso."""
+        total = len(self.registros)
+        if not total:
+            return "break"
+        
+        atual = self._indice_selecionado
+        if atual is None or atual >= total:
+            novo = self._inicio_visivel
+        else:
+            novo = max(0, min(total - 1, atual + delta))
+        self._indice_selecionado = novo
+        
+        if novo < self._inicio_visivel:
+            self._rolar_tabela(novo)
+        elif novo >= self._inicio_visivel + self._linhas_visiveis:
+            self._rolar_tabela(novo - self._linhas_visiveis + 1)
+        
+        item_id = self._itens_visiveis[novo - self._inicio_visivel]
+        self.tabela.selection_set(item_id)
+        self.tabela.focus(item_id)
+        return "break"
+
+    def _on_resize_tabela(self, event):
+        """Ajusta o número de linhas da janela à altura atual da tabela (descontando o cabeçalho)."""
+        # Mede uma linha real: o cabeçalho pode ser mais alto que uma linha (fonte/escala DPI)
+        caixa = self.tabela.bbox(self._itens_visiveis[0]) if self._itens_visiveis else None
+        if caixa:
+            borda, topo, _, altura = caixa
+            linhas = max(1, (event.height - topo - borda) // altura)
+        else:
+            linhas = max(1, event.height // ALTURA_LINHA_TABELA - 1)
+        if linhas != self._linhas_visiveis:
+            self._linhas_visiveis = linhas
+            self._renderizar_tabela()
+
+    @staticmethod
+    def _tag_linha(reg: Registro) -> str:
+        # Determinar tag para cor alternada (mês é a posição 1-based da linha)
+        return "evenrow" if reg.mes % 2 == 1 else "oddrow"
+
+    @staticmethod
+    def _valores_linha(reg: Registro) -> tuple:
+        return (
+            reg.mes,
+            reg.data,
+            reg.valor_fmt,
+            reg.juros_fmt,
+            reg.amort_fmt,
+            reg.saldo_fmt,
+            reg.status,
         )
 
     def _atualiza_resumos(self):
         total_fmt = format_brl(self.total_pago)
-        saldo_fmt = format_brl(self.saldo_restante)
-        print("\n🔄 Atualizando resumos:")
-        print(f"   Total pago: {self.total_pago} → {total_fmt}")
-        print(f"   Dívida restante: {self.saldo_restante} → {saldo_fmt}")
+        if DEBUG:
+            print("\n🔄 Atualizando resumos:")
+            print(f"   Total pago: {self.total_pago} → {total_fmt}")
+            print(f"   Dívida restante: {self.saldo_restante} → {format_brl(self.saldo_restante)}")
 
-        if hasattr(self, "label_total"):
-            self.label_total.config(text=total_fmt)
+        # label_total sempre existe: _build_form roda no __init__ antes de qualquer atualização
+        self.label_total.config(text=total_fmt)
 
     def alternar_status_selecao(self):
         sel = self.tabela.selection()
@@ -649,31 +977,21 @@ class ControleDividaApp(tk.Tk):
             messagebox.showinfo("Aviso", "Selecione uma linha para alternar o status.")
             return
         item_id = sel[0]
-        idx = self.tabela.index(item_id)
-        if idx < 0 or idx >= len(self.registros):
+        reg = self._iid_para_registro.get(item_id)
+        if reg is None:
             return
-        atual = self.registros[idx]["status"]
-        novo = "Pendente" if atual == "Pago" else "Pago"
+        novo = "Pendente" if reg.status == "Pago" else "Pago"
         
-        # Tentar atualizar no servidor
-        if self.modo_online and "server_id" in self.registros[idx]:
-            try:
-                persistence.update_registro(
-                    self.registros[idx]["server_id"],
-                    {"status": novo}
-                )
-            except Exception as e:
-                print(f"⚠️  Erro ao atualizar status no servidor: {e}")
-                messagebox.showwarning(
-                    "Aviso",
-                    f"Erro ao atualizar no servidor:\n{e}\n\nStatus alterado apenas localmente."
-                )
-        
-        self.registros[idx]["status"] = novo
-        # Atualiza somente a coluna de status na view (reinsere valores)
-        vals = list(self.tabela.item(item_id, "values"))
-        vals[-1] = novo
-        self.tabela.item(item_id, values=vals)
+        # Atualizar no servidor em segundo plano
+        if self.modo_online:
+            self._enfileirar_escrita(
+                self._atualizar_status_servidor, reg, novo,
+                aviso="Erro ao atualizar no servidor:\n{erro}\n\nStatus alterado apenas localmente."
+            )
+        
+        reg.status = novo
+        # Atualiza só esta linha, no lugar, a partir do registro (sem ler os valores de volta do Tcl)
+        self.tabela.item(item_id, values=self._valores_linha(reg))
 
     def desfazer_ultimo(self):
         if not self.registros:
@@ -682,40 +1000,40 @@ class ControleDividaApp(tk.Tk):
 
         ultimo = self.registros.pop()
         
-        # Tentar deletar do servidor
-        if self.modo_online and "server_id" in ultimo:
-            try:
-                persistence.delete_registro(ultimo["server_id"])
-            except Exception as e:
-                print(f"⚠️  Erro ao deletar do servidor: {e}")
-                messagebox.showwarning(
-                    "Aviso",
-                    f"Erro ao deletar do servidor:\n{e}\n\nRegistro removido apenas localmente."
-                )
+        # Deletar do servidor em segundo plano
+        if self.modo_online:
+            self._enfileirar_escrita(
+                self._remover_registro_servidor, ultimo,
+                aviso="Erro ao deletar do servidor:\n{erro}\n\nRegistro removido apenas localmente."
+            )
         
-        # Recalcular agregados a partir do zero para evitar erro acumulado
-        self._recalcular_agregado_e_table()
+        # Remover o último registro não altera os anteriores: ajusta os agregados
+        # sem recalcular a sequência (round mantém os centavos exatos)
+        self.total_pago = round(self.total_pago - max(0.0, ultimo.valor), 2)
+        self.saldo_restante = self.registros[-1].saldo if self.registros else self.divida_inicial
+        # A linha desfeita não pode continuar "selecionada": o próximo registro ocuparia o índice
+        if self._indice_selecionado is not None and self._indice_selecionado >= len(self.registros):
+            self._indice_selecionado = None
+        self._renderizar_tabela()
+        self._atualiza_resumos()
 
     def reiniciar(self):
         if not messagebox.askyesno("Confirmar", "Reiniciar e apagar todos os registros?"):
             return
         
-        # Tentar deletar todos do servidor
+        # Deletar todos do servidor em segundo plano (após as escritas pendentes)
         if self.modo_online:
-            try:
-                persistence.delete_todos_registros()
-            except Exception as e:
-                print(f"⚠️  Erro ao deletar registros do servidor: {e}")
-                messagebox.showwarning(
-                    "Aviso",
-                    f"Erro ao deletar do servidor:\n{e}\n\nRegistros removidos apenas localmente."
-                )
+            self._enfileirar_escrita(
+                self._remover_registros_servidor, list(self.registros),
+                aviso="Erro ao deletar do servidor:\n{erro}\n\nRegistros removidos apenas localmente."
+            )
         
         self.registros.clear()
         self.total_pago = 0.0
         self.saldo_restante = self.divida_inicial
-        for item in self.tabela.get_children():
-            self.tabela.delete(item)
+        self._inicio_visivel = 0
+        self._indice_selecionado = None
+        self._renderizar_tabela()
         self._atualiza_resumos()
         self.data_sugerida = date.today()
         
@@ -737,130 +1055,154 @@ class ControleDividaApp(tk.Tk):
             )
             return
         
-        # Verificar se servidor ainda está acessível
-        if not persistence.verificar_conexao():
-            self.modo_online = False
-            messagebox.showerror(
-                "Servidor Indisponível",
-                "O servidor JSON Server não está mais acessível.\n\n"
-                "Por favor, inicie o servidor:\n"
-                "1. Abra um terminal\n"
-                "2. cd servidor\n"
-                "3. pnpm start\n\n"
-                "Depois, reinicie a aplicação."
-            )
-            return
-        
         if not messagebox.askyesno(
             "Confirmar Limpeza",
             "Isso irá deletar TODOS os registros do JSON Server.\n\nDeseja continuar?"
         ):
             return
         
-        try:
+        if DEBUG:
             print("\n🗑️  Iniciando limpeza do histórico no servidor...")
-            persistence.delete_todos_registros()
-            print("✅ Histórico limpo com sucesso no servidor!")
-            
-            # Limpar dados locais e atualizar interface
-            self.registros.clear()
-            self.total_pago = 0.0
-            self.saldo_restante = self.divida_inicial
-            
-            # Limpar tabela
-            for item in self.tabela.get_children():
-                self.tabela.delete(item)
-            
-            # Atualizar resumos
-            self._atualiza_resumos()
-            
-            # Resetar data sugerida
-            self.data_sugerida = date.today()
-            if CALENDARIO_DISPONIVEL:
-                self.date_picker.set_date(self.data_sugerida)
-            else:
-                self.var_data.set(self.data_sugerida.strftime("%d/%m/%Y"))
-            
-            self.var_valor.set("")
-            self.var_status.set("Pago")
-            self.entry_valor.focus_set()
-            
-            messagebox.showinfo(
-                "Sucesso",
-                "Histórico do servidor limpo com sucesso!"
-            )
+        # Sem novos pagamentos até a limpeza terminar: seriam apagados junto com o histórico local
+        self.btn_registrar.state(["disabled"])
+        self._enfileirar_escrita(
+            self._limpar_historico_servidor, list(self.registros),
+            aviso="Erro ao limpar histórico do servidor:\n{erro}"
+        )
+
+    def _limpar_historico_servidor(self, registros):
+        """Tarefa da thread de escrita: verifica o servidor e remove os registros em lote."""
+        if not persistence.verificar_conexao():
+            self._respostas.put((self._servidor_indisponivel_ao_limpar, ()))
+            return
+        
+        try:
+            # server_id lido aqui: os creates pendentes na fila já rodaram
+            persistence.bulk_delete([r.server_id for r in registros if r.server_id is not None])
         except Exception as e:
             print(f"❌ Erro ao limpar histórico: {e}")
-            import traceback
-            traceback.print_exc()
-            
-            # Verificar se é erro de conexão
-            erro_msg = str(e)
-            if "não está disponível" in erro_msg or "Servidor" in erro_msg or "fechou a conexão" in erro_msg:
-                self.modo_online = False
-                messagebox.showerror(
-                    "Erro de Conexão",
-                    f"{erro_msg}\n\n"
-                    "A aplicação foi alterada para modo offline.\n"
-                    "Se alguns registros foram deletados, reinicie a aplicação."
-                )
-            elif "Alguns registros falharam" in erro_msg:
-                # Sucesso parcial - alguns foram deletados
-                messagebox.showwarning(
-                    "Limpeza Parcial",
-                    f"{erro_msg}\n\n"
-                    "Alguns registros foram deletados com sucesso.\n"
-                    "Reinicie a aplicação para sincronizar o estado."
-                )
-            else:
-                messagebox.showerror(
-                    "Erro",
-                    f"Erro ao limpar histórico do servidor:\n\n{erro_msg}"
-                )
+            if DEBUG:
+                import traceback
+                traceback.print_exc()
+            self._respostas.put((self._falha_ao_limpar_historico, (str(e),)))
+            return
+        
+        if DEBUG:
+            print("✅ Histórico limpo com sucesso no servidor!")
+        self._respostas.put((self._concluir_limpeza_historico, ()))
 
-    def _recalcular_agregado_e_table(self):
-        """Recalcula total_pago e saldo_restante percorrendo registros; re-renderiza tabela."""
+    def _servidor_indisponivel_ao_limpar(self):
+        self.btn_registrar.state(["!disabled"])
+        self.modo_online = False
+        messagebox.showerror(
+            "Servidor Indisponível",
+            "O servidor JSON Server não está mais acessível.\n\n"
+            "Por favor, inicie o servidor:\n"
+            "1. Abra um terminal\n"
+            "2. cd servidor\n"
+            "3. pnpm start\n\n"
+            "Depois, reinicie a aplicação."
+        )
+
+    def _concluir_limpeza_historico(self):
+        self.btn_registrar.state(["!disabled"])
+        
+        # Limpar dados locais e atualizar interface
+        self.registros.clear()
         self.total_pago = 0.0
         self.saldo_restante = self.divida_inicial
+        
+        # Limpar tabela
+        self._inicio_visivel = 0
+        self._indice_selecionado = None
+        self._renderizar_tabela()
+        
+        # Atualizar resumos
+        self._atualiza_resumos()
+        
+        # Resetar data sugerida
+        self.data_sugerida = date.today()
+        if CALENDARIO_DISPONIVEL:
+            self.date_picker.set_date(self.data_sugerida)
+        else:
+            self.var_data.set(self.data_sugerida.strftime("%d/%m/%Y"))
+        
+        self.var_valor.set("")
+        self.var_status.set("Pago")
+        self.entry_valor.focus_set()
+        
+        messagebox.showinfo(
+            "Sucesso",
+            "Histórico do servidor limpo com sucesso!"
+        )
 
-        # Limpa tabela e re-insere com mês reindexado
-        for item in self.tabela.get_children():
-            self.tabela.delete(item)
-
-        for i, reg in enumerate(self.registros, start=1):
-            saldo_anterior = self.saldo_restante
-            juros = round(saldo_anterior * self.taxa, 2)
-            amort = round(reg["valor"] - juros, 2)
-            novo_saldo = round(saldo_anterior - amort, 2)
-            if novo_saldo < 0:
-                amort += novo_saldo
-                reg["valor"] += novo_saldo
-                novo_saldo = 0.0
-                amort = round(amort, 2)
-                reg["valor"] = round(reg["valor"], 2)
-
-            self.total_pago = round(self.total_pago + max(0.0, reg["valor"]), 2)
-            self.saldo_restante = novo_saldo
-
-            reg["mes"] = i
-            reg["juros"] = juros
-            reg["amort"] = amort
-            reg["saldo"] = novo_saldo
-
-            self._adiciona_na_tabela(reg)
+    def _falha_ao_limpar_historico(self, erro_msg):
+        self.btn_registrar.state(["!disabled"])
+        
+        # Verificar se é erro de conexão
+        if "não está disponível" in erro_msg or "Servidor" in erro_msg or "fechou a conexão" in erro_msg:
+            self.modo_online = False
+            messagebox.showerror(
+                "Erro de Conexão",
+                f"{erro_msg}\n\n"
+                "A aplicação foi alterada para modo offline.\n"
+                "Se alguns registros foram deletados, reinicie a aplicação."
+            )
+        elif "Alguns registros falharam" in erro_msg:
+            # Sucesso parcial - alguns foram deletados
+            messagebox.showwarning(
+                "Limpeza Parcial",
+                f"{erro_msg}\n\n"
+                "Alguns registros foram deletados com sucesso.\n"
+                "Reinicie a aplicação para sincronizar o estado."
+            )
+        else:
+            messagebox.showerror(
+                "Erro",
+                f"Erro ao limpar histórico do servidor:\n\n{erro_msg}"
+            )
 
+    def _recalcular_agregado_e_table(self):
+        """Recalcula total_pago e saldo_restante percorrendo registros; re-renderiza tabela."""
+        col_valor, col_juros, col_amort, col_saldo = calcular_parcelas(
+            self.divida_inicial, self.taxa, [reg.valor for reg in self.registros]
+        )
+        
+        # Acumula arredondando a cada passo, como registrar_pagamento/desfazer_ultimo:
+        # o valor digitado pode ter mais de 2 casas, então uma soma única daria outro total
+        total = 0.0
+        for valor in col_valor:
+            total = round(total + max(0.0, valor), 2)
+        self.total_pago = total
+        self.saldo_restante = col_saldo[-1] if col_saldo else self.divida_inicial
+
+        # Grava de volta com mês reindexado; só a janela visível é re-inserida na tabela
+        colunas = zip(self.registros, col_valor, col_juros, col_amort, col_saldo)
+        for i, (reg, valor, juros, amort, saldo) in enumerate(colunas, start=1):
+            reg.mes = i
+            # Só reformata quando algum valor mudou (ou ainda não foi formatado)
+            alterado = (
+                reg.saldo_fmt is None
+                or reg.valor != valor
+                or reg.juros != juros
+                or reg.amort != amort
+                or reg.saldo != saldo
+            )
+            reg.valor = valor
+            reg.juros = juros
+            reg.amort = amort
+            reg.saldo = saldo
+            if alterado:
+                formatar_registro(reg)
+
+        self._renderizar_tabela()
         self._atualiza_resumos()
 
 
 def main():
-    try:
-        style = ttk.Style()
-        if "vista" in style.theme_names():
-            style.theme_use("vista")
-        else:
-            style.theme_use("clam")
-    except Exception:
-        pass
+    # Logs da camada de persistência: detalhes de cada requisição só com DIVIDA_DEBUG=1
+    logging.basicConfig(level=logging.DEBUG if DEBUG else logging.WARNING, format="%(message)s")
+    criar_config_padrao()
 
     app = ControleDividaApp()
     app.mainloop()
@@ -2,22 +2,41 @@
 # -*- coding: utf-8 -*-
 """
 Camada de persistência para comunicação com JSON Server.
-Usa apenas bibliotecas padrão do Python (urllib).
+Usa apenas bibliotecas padrão do Python (http.client); se o `orjson` estiver
+instalado, ele é usado para codificar/decodificar JSON.
+
+Cada thread mantém uma conexão HTTP persistente (keep-alive) com o servidor,
+evitando abrir um socket novo a cada requisição.
 """
 
 import json
-import urllib.request
-import urllib.error
+import logging
+import select
+import urllib.parse
 import http.client
+import threading
 import time
-from typing import List, Dict, Optional, Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional, Any, Tuple
+
+# JSON mais rápido (opcional)
+try:
+    import orjson
+    ORJSON_DISPONIVEL = True
+except ImportError:
+    ORJSON_DISPONIVEL = False
 
 # Configuração
 BASE_URL = "http://localhost:3000"
 TIMEOUT = 3  # segundos
+TIMEOUT_VERIFICACAO = 2  # segundos (folga acima do --delay 500 de `pnpm run dev`)
 PERSISTENCIA_ATIVA = True
 MAX_RETRIES = 3  # número máximo de tentativas
 RETRY_DELAY = 0.5  # segundos entre tentativas
+METODOS_IDEMPOTENTES = ("GET", "PUT", "DELETE")  # podem ser reenviados após queda da conexão
+MAX_DELETES_PARALELOS = 8  # threads no fallback de bulk_delete sem a rota em lote
+
+logger = logging.getLogger(__name__)
 
 
 class PersistenceError(Exception):
@@ -25,11 +44,43 @@ class PersistenceError(Exception):
     pass
 
 
+_local = threading.local()
+# GET condicional: URL -> (ETag, corpo) da última resposta 200; compartilhado entre threads
+_etags: Dict[str, Tuple[str, bytes]] = {}
+_etags_lock = threading.Lock()
+
+
+def _obter_conexao(timeout: float) -> http.client.HTTPConnection:
+    """Retorna a conexão persistente da thread atual, criando-a se necessário."""
+    conexao = getattr(_local, "conexao", None)
+    if conexao is None:
+        partes = urllib.parse.urlsplit(BASE_URL)
+        conexao = http.client.HTTPConnection(partes.hostname, partes.port or 80, timeout=timeout)
+        _local.conexao = conexao
+    conexao.timeout = timeout
+    if conexao.sock is not None:
+        conexao.sock.settimeout(timeout)
+        # Socket ocioso "legível" = servidor já fechou (keep-alive expirado): reabre antes de enviar
+        if select.select([conexao.sock], [], [], 0)[0]:
+            logger.debug("[PERSISTENCE] Conexão ociosa fechada pelo servidor, reconectando...")
+            conexao.close()
+    return conexao
+
+
+def _fechar_conexao() -> None:
+    """Fecha e descarta a conexão persistente da thread atual."""
+    conexao = getattr(_local, "conexao", None)
+    if conexao is not None:
+        conexao.close()
+        _local.conexao = None
+
+
 def _fazer_requisicao(
     url: str,
     metodo: str = "GET",
     dados: Optional[Dict[str, Any]] = None,
-    timeout: int = TIMEOUT
+    timeout: float = TIMEOUT,
+    status_esperados: Tuple[int, ...] = ()
 ) -> Optional[Dict[str, Any]]:
     """
     Faz uma requisição HTTP ao JSON Server.
@@ -39,10 +90,45 @@ def _fazer_requisicao(
         metodo: GET, POST, PATCH, DELETE, etc.
         dados: Dicionário a ser enviado como JSON (para POST/PATCH)
         timeout: Timeout da requisição em segundos
+        status_esperados: Códigos de erro HTTP que o chamador trata (ainda geram
+            PersistenceError, mas sem log de erro)
     
     Returns:
         Dicionário com a resposta JSON ou None
     
+    Raises:
+        PersistenceError: Se houver erro de rede ou HTTP
+    """
+    return _enviar(url, metodo, _serializar(dados), timeout, status_esperados)
+
+
+def _serializar(dados: Optional[Dict[str, Any]]) -> Optional[bytes]:
+    """Codifica `dados` como corpo JSON (None quando não há corpo)."""
+    if dados is None:
+        return None
+    if ORJSON_DISPONIVEL:
+        return orjson.dumps(dados)  # já retorna bytes
+    return json.dumps(dados, separators=(",", ":")).encode('utf-8')
+
+
+def _desserializar(corpo: bytes) -> Any:
+    """Decodifica um corpo JSON (bytes UTF-8)."""
+    if ORJSON_DISPONIVEL:
+        return orjson.loads(corpo)
+    return json.loads(corpo)
+
+
+def _enviar(
+    url: str,
+    metodo: str,
+    corpo: Optional[bytes],
+    timeout: float = TIMEOUT,
+    status_esperados: Tuple[int, ...] = ()
+) -> Optional[Dict[str, Any]]:
+    """
+    Envia um corpo já serializado e decodifica a resposta JSON.
+    Permite reenviar os mesmos bytes em novas tentativas sem serializar de novo.
+    
     Raises:
         PersistenceError: Se houver erro de rede ou HTTP
     """
@@ -50,54 +136,87 @@ def _fazer_requisicao(
         raise PersistenceError("Persistência desativada")
     
     # LOG: Requisição iniciada
-    print(f"[PERSISTENCE] {metodo} {url}")
-    if dados:
-        print(f"[PERSISTENCE] Dados: {json.dumps(dados, indent=2)}")
+    logger.debug("[PERSISTENCE] %s %s", metodo, url)
+    if corpo and logger.isEnabledFor(logging.DEBUG):
+        # Exibe os bytes já serializados, sem um json.dumps extra só para o log
+        logger.debug("[PERSISTENCE] Dados: %s", corpo.decode('utf-8'))
     
-    try:
-        headers = {"Content-Type": "application/json"}
-        
-        if dados is not None:
-            data_bytes = json.dumps(dados).encode('utf-8')
-            req = urllib.request.Request(url, data=data_bytes, headers=headers, method=metodo)
-        else:
-            req = urllib.request.Request(url, headers=headers, method=metodo)
-        
-        with urllib.request.urlopen(req, timeout=timeout) as response:
-            print(f"[PERSISTENCE] Status: {response.status}")
-            
-            if response.status == 204:  # No Content (DELETE bem-sucedido)
-                print(f"[PERSISTENCE] ✅ {metodo} bem-sucedido (No Content)")
-                return None
-            
-            body = response.read().decode('utf-8')
-            if not body:
-                print(f"[PERSISTENCE] ⚠️  Resposta vazia")
-                return None
-            
-            resultado = json.loads(body)
-            print(f"[PERSISTENCE] ✅ Resposta recebida")
-            return resultado
-    
-    except urllib.error.HTTPError as e:
-        print(f"[PERSISTENCE] ❌ Erro HTTP {e.code}: {e.reason}")
-        raise PersistenceError(f"Erro HTTP {e.code}: {e.reason}")
-    except urllib.error.URLError as e:
-        erro_msg = str(e.reason)
-        print(f"[PERSISTENCE] ❌ Erro de conexão: {erro_msg}")
-        # Mensagem mais amigável para erro de conexão
-        if "Connection refused" in erro_msg or "closed connection" in erro_msg.lower():
+    partes = urllib.parse.urlsplit(url)
+    caminho = partes.path or "/"
+    if partes.query:
+        caminho += "?" + partes.query
+    headers = {"Content-Type": "application/json"}
+    
+    # Se já temos o corpo desta URL, o servidor pode responder 304 sem reenviá-lo
+    em_cache = None
+    if metodo == "GET":
+        with _etags_lock:
+            em_cache = _etags.get(url)
+        if em_cache is not None:
+            headers["If-None-Match"] = em_cache[0]
+    
+    for tentativa in range(2):
+        conexao = _obter_conexao(timeout)
+        reaproveitada = conexao.sock is not None
+        try:
+            conexao.request(metodo, caminho, body=corpo, headers=headers)
+            response = conexao.getresponse()
+            body = response.read()
+            break
+        except ConnectionRefusedError as e:
+            _fechar_conexao()
+            logger.error("[PERSISTENCE] ❌ Erro de conexão: %s", e)
             raise PersistenceError("Servidor não está disponível. Inicie o JSON Server com 'pnpm start' na pasta servidor/")
-        raise PersistenceError(f"Erro de conexão: {erro_msg}")
-    except json.JSONDecodeError as e:
-        print(f"[PERSISTENCE] ❌ Erro ao decodificar JSON: {e}")
+        except (http.client.BadStatusLine, ConnectionError) as e:
+            # Conexão reutilizada caiu durante o envio: reconecta e tenta uma vez mais, mas só
+            # se reenviar for seguro (um POST pode já ter sido processado e duplicaria o registro)
+            _fechar_conexao()
+            if reaproveitada and tentativa == 0 and metodo in METODOS_IDEMPOTENTES:
+                logger.debug("[PERSISTENCE] Conexão reutilizada foi fechada (keep-alive expirado), reconectando...")
+                continue
+            logger.error("[PERSISTENCE] ❌ Conexão fechada pelo servidor: %s", e)
+            raise PersistenceError(f"Servidor fechou a conexão. Tente novamente.")
+        except (OSError, http.client.HTTPException) as e:
+            _fechar_conexao()
+            logger.error("[PERSISTENCE] ❌ Erro de conexão: %s", e)
+            raise PersistenceError(f"Erro de conexão: {e}")
+    
+    if response.will_close:
+        _fechar_conexao()
+    
+    logger.debug("[PERSISTENCE] Status: %s", response.status)
+    
+    if response.status == 304 and em_cache is not None:
+        logger.debug("[PERSISTENCE] ✅ Não modificado, usando resposta anterior")
+        body = em_cache[1]
+    elif metodo == "GET" and response.status == 200:
+        etag = response.getheader("ETag")
+        if etag:
+            with _etags_lock:
+                _etags[url] = (etag, body)
+    
+    if response.status >= 400:
+        if response.status in status_esperados:
+            logger.debug("[PERSISTENCE] HTTP %s: %s (tratado pelo chamador)", response.status, response.reason)
+        else:
+            logger.error("[PERSISTENCE] ❌ Erro HTTP %s: %s", response.status, response.reason)
+        raise PersistenceError(f"Erro HTTP {response.status}: {response.reason}")
+    
+    if response.status == 204:  # No Content (DELETE bem-sucedido)
+        logger.debug("[PERSISTENCE] ✅ %s bem-sucedido (No Content)", metodo)
+        return None
+    
+    if not body:
+        logger.warning("[PERSISTENCE] ⚠️  Resposta vazia")
+        return None
+    
+    try:
+        resultado = _desserializar(body)
+    except ValueError as e:  # JSONDecodeError (json/orjson) e UnicodeDecodeError
+        logger.error("[PERSISTENCE] ❌ Erro ao decodificar JSON: %s", e)
         raise PersistenceError(f"Erro ao decodificar JSON: {e}")
-    except http.client.RemoteDisconnected as e:
-        print(f"[PERSISTENCE] ❌ Conexão fechada pelo servidor: {e}")
-        raise PersistenceError(f"Servidor fechou a conexão. Tente novamente.")
-    except Exception as e:
-        print(f"[PERSISTENCE] ❌ Erro inesperado: {e}")
-        raise PersistenceError(f"Erro inesperado: {e}")
+    logger.debug("[PERSISTENCE] ✅ Resposta recebida")
+    return resultado
 
 
 def read_all_registros() -> List[Dict[str, Any]]:
@@ -110,11 +229,11 @@ def read_all_registros() -> List[Dict[str, Any]]:
     Raises:
         PersistenceError: Se houver erro na requisição
     """
-    print("[PERSISTENCE] 📖 Lendo todos os registros...")
+    logger.info("[PERSISTENCE] 📖 Lendo todos os registros...")
     url = f"{BASE_URL}/registros"
     resultado = _fazer_requisicao(url, metodo="GET")
     total = len(resultado) if resultado else 0
-    print(f"[PERSISTENCE] 📖 Total de registros: {total}")
+    logger.info("[PERSISTENCE] 📖 Total de registros: %s", total)
     return resultado if resultado is not None else []
 
 
@@ -131,10 +250,10 @@ def create_registro(item: Dict[str, Any]) -> Dict[str, Any]:
     Raises:
         PersistenceError: Se houver erro na requisição
     """
-    print(f"[PERSISTENCE] ➕ Criando registro (Mês {item.get('mes', '?')})...")
+    logger.info("[PERSISTENCE] ➕ Criando registro (Mês %s)...", item.get('mes', '?'))
     url = f"{BASE_URL}/registros"
     resultado = _fazer_requisicao(url, metodo="POST", dados=item)
-    print(f"[PERSISTENCE] ➕ Registro criado com ID: {resultado.get('id', '?')}")
+    logger.info("[PERSISTENCE] ➕ Registro criado com ID: %s", resultado.get('id', '?'))
     return resultado
 
 
@@ -152,10 +271,10 @@ def update_registro(registro_id: int, patch: Dict[str, Any]) -> Dict[str, Any]:
     Raises:
         PersistenceError: Se houver erro na requisição
     """
-    print(f"[PERSISTENCE] ✏️  Atualizando registro ID {registro_id}...")
+    logger.info("[PERSISTENCE] ✏️  Atualizando registro ID %s...", registro_id)
     url = f"{BASE_URL}/registros/{registro_id}"
     resultado = _fazer_requisicao(url, metodo="PATCH", dados=patch)
-    print(f"[PERSISTENCE] ✏️  Registro {registro_id} atualizado")
+    logger.info("[PERSISTENCE] ✏️  Registro %s atualizado", registro_id)
     return resultado
 
 
@@ -169,58 +288,103 @@ def delete_registro(registro_id: int) -> None:
     Raises:
         PersistenceError: Se houver erro na requisição após todas as tentativas
     """
-    print(f"[PERSISTENCE] 🗑️  Deletando registro ID {registro_id}...")
+    logger.info("[PERSISTENCE] 🗑️  Deletando registro ID %s...", registro_id)
     url = f"{BASE_URL}/registros/{registro_id}"
     
     for tentativa in range(MAX_RETRIES):
         try:
-            _fazer_requisicao(url, metodo="DELETE")
-            print(f"[PERSISTENCE] 🗑️  Registro {registro_id} deletado")
+            _enviar(url, "DELETE", None)
+            logger.info("[PERSISTENCE] 🗑️  Registro %s deletado", registro_id)
             return
         except PersistenceError as e:
             if "fechou a conexão" in str(e) and tentativa < MAX_RETRIES - 1:
-                print(f"[PERSISTENCE] ⚠️  Tentativa {tentativa + 1} falhou, aguardando...")
+                logger.warning("[PERSISTENCE] ⚠️  Tentativa %s falhou, aguardando...", tentativa + 1)
                 time.sleep(RETRY_DELAY * (tentativa + 1))  # Delay progressivo
                 continue
             raise
 
 
-def delete_todos_registros() -> None:
+def bulk_delete(ids: List[int]) -> int:
     """
-    Remove todos os registros do servidor.
-    Faz múltiplas requisições DELETE com delay entre elas para evitar sobrecarga.
+    Remove vários registros em uma única requisição.
+    Usa a rota customizada POST /registros/bulk-delete (servidor/server.js).
+    Se o servidor não tiver essa rota (ex.: `json-server` iniciado direto pelo CLI),
+    cai para DELETEs individuais disparados em paralelo.
+    
+    Args:
+        ids: IDs dos registros a serem removidos
+    
+    Returns:
+        Quantidade de registros removidos pelo servidor
     
     Raises:
         PersistenceError: Se houver erro na requisição
     """
-    print("[PERSISTENCE] 🗑️  Deletando TODOS os registros...")
-    registros = read_all_registros()
-    total = len(registros)
-    print(f"[PERSISTENCE] 🗑️  Total a deletar: {total}")
+    ids = list(ids)
+    if not ids:
+        return 0
     
+    logger.info("[PERSISTENCE] 🗑️  Deletando %s registro(s) em lote...", len(ids))
+    url = f"{BASE_URL}/registros/bulk-delete"
+    try:
+        # 404: servidor sem a rota em lote (json-server pelo CLI) -> fallback abaixo
+        resultado = _fazer_requisicao(url, metodo="POST", dados={"ids": ids}, status_esperados=(404,))
+    except PersistenceError as e:
+        if "Erro HTTP 404" not in str(e):
+            raise
+        logger.info("[PERSISTENCE] 🗑️  Rota bulk-delete indisponível, deletando individualmente em paralelo...")
+        return _delete_em_paralelo(ids)
+    removidos = resultado.get("removidos", 0) if resultado else 0
+    logger.info("[PERSISTENCE] 🗑️  %s registro(s) removido(s)", removidos)
+    return removidos
+
+
+def _delete_em_paralelo(ids: List[int]) -> int:
+    """
+    Remove os registros com DELETEs individuais em um pool de threads.
+    
+    Returns:
+        Quantidade de registros removidos
+    
+    Raises:
+        PersistenceError: Se alguma remoção falhar (mensagem indica falha parcial ou total)
+    """
     erros = []
-    for i, reg in enumerate(registros, 1):
-        if "id" in reg:
-            print(f"[PERSISTENCE] 🗑️  Deletando {i}/{total}...")
+    with ThreadPoolExecutor(max_workers=MAX_DELETES_PARALELOS) as executor:
+        futuros = {executor.submit(delete_registro, registro_id): registro_id for registro_id in ids}
+        for futuro in as_completed(futuros):
             try:
-                delete_registro(reg["id"])
-                # Pequeno delay entre requisições para não sobrecarregar o servidor
-                if i < total:
-                    time.sleep(0.1)
+                futuro.result()
             except PersistenceError as e:
-                print(f"[PERSISTENCE] ⚠️  Falha ao deletar ID {reg['id']}: {e}")
-                erros.append((reg["id"], str(e)))
-                continue
+                logger.warning("[PERSISTENCE] ⚠️  Falha ao deletar ID %s: %s", futuros[futuro], e)
+                erros.append((futuros[futuro], str(e)))
     
-    if erros:
-        print(f"[PERSISTENCE] ⚠️  Alguns registros falharam: {len(erros)} erro(s)")
-        # Não lançar exceção se pelo menos alguns foram deletados
-        if len(erros) < total:
-            print(f"[PERSISTENCE] ✅ {total - len(erros)}/{total} registros deletados")
-        else:
-            raise PersistenceError(f"Falha ao deletar todos os registros. Primeira falha: {erros[0][1]}")
-    else:
-        print(f"[PERSISTENCE] 🗑️  Todos os {total} registros foram deletados")
+    total = len(ids)
+    if not erros:
+        return total
+    if len(erros) < total:
+        raise PersistenceError(
+            f"Alguns registros falharam: {len(erros)} erro(s), {total - len(erros)}/{total} deletados"
+        )
+    raise PersistenceError(f"Falha ao deletar todos os registros. Primeira falha: {erros[0][1]}")
+
+
+def delete_todos_registros(ids: Optional[List[int]] = None) -> None:
+    """
+    Remove todos os registros do servidor com uma única requisição em lote (ver bulk_delete).
+    
+    Args:
+        ids: IDs já conhecidos pelo chamador (ex.: espelho local dos registros).
+             Se omitido, os IDs são lidos do servidor antes (um GET a mais).
+    
+    Raises:
+        PersistenceError: Se houver erro na requisição
+    """
+    logger.info("[PERSISTENCE] 🗑️  Deletando TODOS os registros...")
+    if ids is None:
+        ids = [reg["id"] for reg in read_all_registros() if "id" in reg]
+    removidos = bulk_delete(ids)
+    logger.info("[PERSISTENCE] 🗑️  Todos os %s registros foram deletados", removidos)
 
 
 def read_config() -> Dict[str, Any]:
@@ -244,22 +408,27 @@ def read_config() -> Dict[str, Any]:
     return {"divida_inicial": 50000.0, "taxa": 0.01}
 
 
-def verificar_conexao() -> bool:
+def verificar_conexao(timeout: float = TIMEOUT_VERIFICACAO) -> bool:
     """
     Verifica se o JSON Server está acessível.
+    Pede só um registro (/registros?_limit=1): a coleção sempre existe e o
+    histórico inteiro não precisa ser baixado.
+    
+    Args:
+        timeout: Timeout da verificação em segundos
     
     Returns:
         True se conectou com sucesso, False caso contrário
     """
     if not PERSISTENCIA_ATIVA:
-        print("[PERSISTENCE] ⚠️  Persistência desativada")
+        logger.warning("[PERSISTENCE] ⚠️  Persistência desativada")
         return False
     
-    print(f"[PERSISTENCE] 🔍 Verificando conexão com {BASE_URL}...")
+    logger.info("[PERSISTENCE] 🔍 Verificando conexão com %s...", BASE_URL)
     try:
-        _fazer_requisicao(f"{BASE_URL}/registros", metodo="GET", timeout=2)
-        print("[PERSISTENCE] ✅ Conexão estabelecida!")
+        _fazer_requisicao(f"{BASE_URL}/registros?_limit=1", metodo="GET", timeout=timeout)
+        logger.info("[PERSISTENCE] ✅ Conexão estabelecida!")
         return True
     except PersistenceError as e:
-        print(f"[PERSISTENCE] ❌ Falha na conexão: {e}")
+        logger.error("[PERSISTENCE] ❌ Falha na conexão: %s", e)
         return False
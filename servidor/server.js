@@ -0,0 +1,51 @@
+// JSON Server do Controle de Dívida, com rotas extras além do CRUD padrão.
+//
+// Uso:
+//   node server.js                 # porta 3000
+//   node server.js --port 3001     # porta customizada
+//   node server.js --delay 500     # simula latência de rede (ms)
+
+const path = require('path')
+const jsonServer = require('json-server')
+
+function lerOpcao(nome, padrao) {
+  const i = process.argv.indexOf(`--${nome}`)
+  return i !== -1 && process.argv[i + 1] ? Number(process.argv[i + 1]) : padrao
+}
+
+const porta = lerOpcao('port', 3000)
+const atraso = lerOpcao('delay', 0)
+
+const server = jsonServer.create()
+const router = jsonServer.router(path.join(__dirname, 'db.json'))
+
+server.use(jsonServer.defaults())
+server.use(jsonServer.bodyParser)
+
+if (atraso > 0) {
+  server.use((req, res, next) => setTimeout(next, atraso))
+}
+
+// Remove vários registros em uma única requisição.
+// Corpo: { "ids": [1, 2, 3] }  ->  Resposta: { "removidos": 3 }
+server.post('/registros/bulk-delete', (req, res) => {
+  const ids = req.body && req.body.ids
+  if (!Array.isArray(ids)) {
+    res.status(400).jsonp({ erro: "Campo 'ids' deve ser uma lista" })
+    return
+  }
+
+  const alvo = new Set(ids)
+  const removidos = router.db
+    .get('registros')
+    .remove((registro) => alvo.has(registro.id))
+    .write()
+
+  res.jsonp({ removidos: removidos.length })
+})
+
+server.use(router)
+
+server.listen(porta, () => {
+  console.log(`JSON Server rodando em http://localhost:${porta}`)
+})
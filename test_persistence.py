@@ -5,6 +5,7 @@ Script de teste para a camada de persistência.
 Testa as operações CRUD com o JSON Server.
 """
 
+import logging
 import persistence
 from datetime import datetime
 
@@ -92,8 +93,48 @@ def teste_crud():
     except Exception as e:
         print(f"❌ Erro ao verificar: {e}")
 
+def teste_bulk_delete():
+    """Testa a remoção de vários registros em uma única requisição."""
+    print("\n🔍 Testando remoção em lote...")
+    
+    ids = []
+    try:
+        for i in range(3):
+            resultado = persistence.create_registro({
+                "mes": 900 + i,
+                "data": datetime.now().strftime("%d/%m/%Y"),
+                "valor": 100.00,
+                "juros": 0.0,
+                "amort": 100.00,
+                "saldo": 0.0,
+                "status": "Pago",
+                "createdAt": datetime.now().isoformat() + "Z"
+            })
+            ids.append(resultado['id'])
+        print(f"✅ Criados registros de teste: {ids}")
+    except Exception as e:
+        print(f"❌ Erro ao criar registros de teste: {e}")
+        return
+    
+    try:
+        removidos = persistence.bulk_delete(ids)
+        print(f"✅ Removidos em lote: {removidos}/{len(ids)}")
+    except Exception as e:
+        print(f"❌ Erro na remoção em lote: {e}")
+        return
+    
+    try:
+        restantes = [r for r in persistence.read_all_registros() if r.get('id') in ids]
+        if restantes:
+            print(f"❌ Registros ainda presentes: {[r['id'] for r in restantes]}")
+        else:
+            print("✅ Nenhum registro de teste restante")
+    except Exception as e:
+        print(f"❌ Erro ao verificar: {e}")
+
 def main():
     """Executa todos os testes."""
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
     print("=" * 60)
     print("  TESTE DA CAMADA DE PERSISTÊNCIA")
     print("=" * 60)
@@ -114,6 +155,9 @@ def main():
     # Teste 3: CRUD
     teste_crud()
     
+    # Teste 4: Remoção em lote
+    teste_bulk_delete()
+    
     print("\n" + "=" * 60)
     print("✅ Todos os testes concluídos!")
     print("=" * 60)